@@ -5,24 +5,58 @@ from .HDF5Reader import HDF5Reader
 
 import daqdataformats  # noqa: F401 : Not used, but needed to recognize formats.
 import trgdataformats
+from hdf5libs import HDF5RawDataFile
+
+from concurrent.futures import ThreadPoolExecutor
+import operator
+import threading
 
 import numpy as np
 from numpy.typing import NDArray
 
+# Fetches all TA fields with a single call per TA, collapsing 13
+# separate LOAD_ATTR dispatches into one loop on the C side (the
+# attribute lookups themselves still happen). Order must match
+# :TCReader.ta_dt:.
+_TA_ATTRS = operator.attrgetter(
+        'adc_integral',
+        'adc_peak',
+        'algorithm',
+        'channel_end',
+        'channel_peak',
+        'channel_start',
+        'detid',
+        'time_activity',
+        'time_end',
+        'time_peak',
+        'time_start',
+        'type',
+        'version')
+
 
 class TCReader(HDF5Reader):
     """
     Class that reads a given HDF5 data file and can
     process the TC fragments within.
 
-    Loading fragments appends to :self.tc_data: and :self.ta_data:.
-    NumPy dtypes of :self.tc_data: and :self.ta_data: are available
-    as :TCReader.tc_dt: and :TCReader.ta_dt:.
+    :self.read_all_fragments: fills :self.tc_data: and :self.ta_data:;
+    :self.read_fragment: returns per-fragment arrays by value.
+    :self.tc_data: is a dict of parallel per-field arrays
+    (struct-of-arrays), so column access such as
+    :self.tc_data['time_start']: is a contiguous load. The field
+    names and dtypes of :self.tc_data: and :self.ta_data: are
+    available as :TCReader.tc_dt: and :TCReader.ta_dt:. TA times are
+    uint32 tick offsets from the parent TC's time_start; add the
+    matching :self.tc_data['time_start']: entry to recover absolute
+    timestamps.
 
     TC reading can print information that is relevant about the
     loading process by specifying the verbose level. 0 for errors
     only. 1 for warnings. 2 for all information.
     """
+    # Thread count for reading fragments concurrently.
+    _MAX_READ_WORKERS = 8
+
     # TC data type
     tc_dt = np.dtype([
         ('algorithm', trgdataformats.TriggerCandidateData.Algorithm),
@@ -35,19 +69,23 @@ class TCReader(HDF5Reader):
         ('version', np.uint16),
     ])
 
-    # TA data type
+    # TA data type. ADC counts fit in uint32, and the TA times are
+    # stored as uint32 tick offsets from the parent TC's 64-bit
+    # time_start (the anchor in :self.tc_data['time_start']:), halving
+    # the bytes moved when scanning TA columns. 2^32 ticks at 16 ns
+    # per tick is ~68 s, far beyond one trigger record.
     ta_dt = np.dtype([
-        ('adc_integral', np.uint64),
-        ('adc_peak', np.uint64),
+        ('adc_integral', np.uint32),
+        ('adc_peak', np.uint32),
         ('algorithm', trgdataformats.TriggerActivityData.Algorithm),
         ('channel_end', np.int32),
         ('channel_peak', np.int32),
         ('channel_start', np.int32),
         ('detid', np.uint16),
-        ('time_activity', np.uint64),
-        ('time_end', np.uint64),
-        ('time_peak', np.uint64),
-        ('time_start', np.uint64),
+        ('time_activity', np.uint32),
+        ('time_end', np.uint32),
+        ('time_peak', np.uint32),
+        ('time_start', np.uint32),
         ('type', trgdataformats.TriggerActivityData.Type),
         ('version', np.uint16)
     ])
@@ -63,19 +101,39 @@ class TCReader(HDF5Reader):
         Returns nothing.
         """
         super().__init__(filename, verbosity)
-        self.tc_data = np.array([], dtype=self.tc_dt)  # Will concatenate new TCs
+        # The hdf5libs bindings are not guaranteed thread-safe, so each
+        # pool worker opens its own handle on first use. The thread
+        # running __init__ reuses the handle the base class opened.
+        self._filename = filename
+        self._thread_h5 = threading.local()
+        self._thread_h5.file = self._h5_file
+        self._num_empty_lock = threading.Lock()
+        # Struct-of-arrays: one contiguous column per TC field.
+        self.tc_data = {name: np.empty(0, dtype=dt) for name, (dt, _) in self.tc_dt.fields.items()}
         self.ta_data = []  # ta_data[i] will be a np.ndarray of TAs from the i-th TC
+        # CSR-style flattening of ta_data: one contiguous TA array plus
+        # per-TC offsets, filled by read_all_fragments.
+        self.ta_data_flat = np.empty(0, dtype=self.ta_dt)
+        self.ta_offsets = np.zeros(1, dtype=np.int64)
         return None
 
-    def __getitem__(self, key: int | str) -> NDArray[tc_dt]:
+    def __getitem__(self, key: str) -> NDArray:
         return self.tc_data[key]
 
-    def __setitem__(self, key: int | str, value: NDArray[tc_dt]) -> None:
+    def __setitem__(self, key: str, value: NDArray) -> None:
         self.tc_data[key] = value
         return
 
     def __len__(self) -> int:
-        return len(self.tc_data)
+        return len(self.tc_data['time_start'])
+
+    def _get_thread_h5_file(self) -> HDF5RawDataFile:
+        """ Return this thread's HDF5 handle, opening one if needed. """
+        h5_file = getattr(self._thread_h5, 'file', None)
+        if h5_file is None:
+            h5_file = HDF5RawDataFile(self._filename)
+            self._thread_h5.file = h5_file
+        return h5_file
 
     def _filter_fragment_paths(self) -> None:
         """ Filter the fragment paths for TCs. """
@@ -89,21 +147,26 @@ class TCReader(HDF5Reader):
         self._fragment_paths = fragment_paths
         return None
 
-    def read_fragment(self, fragment_path: str) -> NDArray:
+    def read_fragment(self, fragment_path: str) -> tuple[NDArray, list[NDArray]]:
         """
-        Read from the given data fragment path.
+        Read from the given data fragment path without touching member data.
 
-        Returns a np.ndarray of the first TC that was read and appends all TCs in the fragment to :self.tc_data:.
+        Returns a np.ndarray of the TCs that were read and the jagged
+        list of TA arrays, one per TC. Shared state is untouched (apart
+        from the empty fragment counter), so fragments can be read
+        concurrently. :self.read_all_fragments: appends the results to
+        :self.tc_data: and :self.ta_data:.
         """
         if self._verbosity >= 2:
             print("="*60)
             print(f"INFO: Reading from the path\n{fragment_path}")
 
-        fragment = self._h5_file.get_frag(fragment_path)
+        fragment = self._get_thread_h5_file().get_frag(fragment_path)
         fragment_data_size = fragment.get_data_size()
 
         if fragment_data_size == 0:  # Empty fragment
-            self._num_empty += 1
+            with self._num_empty_lock:
+                self._num_empty += 1
             if self._verbosity >= 1:
                 print(
                         self._FAIL_TEXT_COLOR
@@ -112,60 +175,181 @@ class TCReader(HDF5Reader):
                         + self._END_TEXT_COLOR
                 )
                 print("="*60)
-            return np.array([], dtype=self.tc_dt)
+            return np.array([], dtype=self.tc_dt), []
+
+        # Check the verbose level once and dispatch, keeping the
+        # silent production loop free of per-TC branches and f-strings.
+        if self._verbosity >= 2:
+            np_tc_data, ta_list = self._parse_fragment_verbose(fragment, fragment_data_size, fragment_path)
+            print("INFO: Finished reading.")
+            print("="*60)
+        else:
+            np_tc_data, ta_list = self._parse_fragment(fragment, fragment_data_size, fragment_path)
+
+        return np_tc_data, ta_list
+
+    def _parse_fragment(self, fragment, fragment_data_size: int,
+                        fragment_path: str) -> tuple[NDArray, list[NDArray]]:
+        """
+        Parse the TCs and TAs of a non-empty fragment. Silent fast path.
+
+        Returns a np.ndarray of the TCs and the jagged list of TA arrays.
+        :fragment_path: is only used to identify the fragment in errors.
+        """
+        # NOTE: The fragment payload is only reachable through the
+        # pybind11 overlay objects; fragment.get_data() returns an
+        # opaque pointer rather than anything exposing the buffer
+        # protocol, so the TCs cannot be bulk-parsed with
+        # np.frombuffer and must be walked one object at a time.
+        byte_idx = 0  # Variable TC sizing, must do a while loop.
+        tc_list = []  # Collect TC tuples and convert to a np.ndarray once per fragment.
+        ta_list = []  # ta_list[i] will be a np.ndarray of TAs from the i-th TC.
+        while byte_idx < fragment_data_size:
+            # Process TC data. Bind the data struct and the TA count
+            # once; every access crosses the pybind11 boundary.
+            tc_datum = trgdataformats.TriggerCandidate(fragment.get_data(byte_idx))
+            d = tc_datum.data
+            n_tas = tc_datum.n_inputs()
+            anchor = d.time_start  # Also the TA time anchor.
+            tc_list.append((
+                        d.algorithm,
+                        d.detid,
+                        n_tas,
+                        d.time_candidate,
+                        d.time_end,
+                        anchor,
+                        d.type,
+                        d.version))
+
+            byte_idx += tc_datum.sizeof()
 
+            # Process TA data. Times become offsets from the TC anchor.
+            np_ta_data = np.zeros(n_tas, dtype=self.ta_dt)
+            try:
+                for ta_idx, ta in enumerate(tc_datum):
+                    # Structured scalar assignment accepts a plain tuple,
+                    # avoiding a throwaway one-element np.ndarray per TA.
+                    row = _TA_ATTRS(ta)
+                    np_ta_data[ta_idx] = (
+                            row[0], row[1], row[2], row[3], row[4], row[5],
+                            np.uint16(row[6]),
+                            row[7] - anchor, row[8] - anchor, row[9] - anchor, row[10] - anchor,
+                            row[11], row[12])
+            except OverflowError as err:
+                # Most likely a TA time before the parent TC's
+                # time_start, which cannot be stored as a uint32 offset.
+                raise ValueError(
+                        f"TA field out of range for ta_dt on TC index {len(tc_list) - 1} "
+                        f"(time anchor {anchor}) in fragment\n{fragment_path}"
+                ) from err
+            ta_list.append(np_ta_data)  # Jagged array
+
+        return np.array(tc_list, dtype=self.tc_dt), ta_list
+
+    def _parse_fragment_verbose(self, fragment, fragment_data_size: int,
+                                fragment_path: str) -> tuple[NDArray, list[NDArray]]:
+        """
+        Same parse as :self._parse_fragment: with per-TC debug output.
+        """
         tc_idx = 0  # Debugging output.
         byte_idx = 0  # Variable TC sizing, must do a while loop.
+        tc_list = []
+        ta_list = []
         while byte_idx < fragment_data_size:
-            if self._verbosity >= 2:
-                print(f"INFO: Fragment Index: {tc_idx}.")
-                tc_idx += 1
-                print(f"INFO: Byte Index / Frag Size: {byte_idx} / {fragment_data_size}")
+            print(f"INFO: Fragment Index: {tc_idx}.")
+            tc_idx += 1
+            print(f"INFO: Byte Index / Frag Size: {byte_idx} / {fragment_data_size}")
 
             # Process TC data
             tc_datum = trgdataformats.TriggerCandidate(fragment.get_data(byte_idx))
-            np_tc_datum = np.array([(
-                                tc_datum.data.algorithm,
-                                tc_datum.data.detid,
-                                tc_datum.n_inputs(),
-                                tc_datum.data.time_candidate,
-                                tc_datum.data.time_end,
-                                tc_datum.data.time_start,
-                                tc_datum.data.type,
-                                tc_datum.data.version)],
-                                dtype=self.tc_dt)
-
-            self.tc_data = np.hstack((self.tc_data, np_tc_datum))
+            d = tc_datum.data
+            n_tas = tc_datum.n_inputs()
+            anchor = d.time_start  # Also the TA time anchor.
+            tc_list.append((
+                        d.algorithm,
+                        d.detid,
+                        n_tas,
+                        d.time_candidate,
+                        d.time_end,
+                        anchor,
+                        d.type,
+                        d.version))
 
             byte_idx += tc_datum.sizeof()
-            if self._verbosity >= 2:
-                print(f"INFO: Upcoming byte index: {byte_idx}.")
-
-            # Process TA data
-            np_ta_data = np.zeros(np_tc_datum['num_tas'], dtype=self.ta_dt)
-            for ta_idx, ta in enumerate(tc_datum):
-                np_ta_data[ta_idx] = np.array([(
-                                            ta.adc_integral,
-                                            ta.adc_peak,
-                                            ta.algorithm,
-                                            ta.channel_end,
-                                            ta.channel_peak,
-                                            ta.channel_start,
-                                            np.uint16(ta.detid),
-                                            ta.time_activity,
-                                            ta.time_end,
-                                            ta.time_peak,
-                                            ta.time_start,
-                                            ta.type,
-                                            ta.version)],
-                                            dtype=self.ta_dt)
-            self.ta_data.append(np_ta_data)  # Jagged array
+            print(f"INFO: Upcoming byte index: {byte_idx}.")
+
+            # Process TA data. Times become offsets from the TC anchor.
+            np_ta_data = np.zeros(n_tas, dtype=self.ta_dt)
+            try:
+                for ta_idx, ta in enumerate(tc_datum):
+                    row = _TA_ATTRS(ta)
+                    np_ta_data[ta_idx] = (
+                            row[0], row[1], row[2], row[3], row[4], row[5],
+                            np.uint16(row[6]),
+                            row[7] - anchor, row[8] - anchor, row[9] - anchor, row[10] - anchor,
+                            row[11], row[12])
+            except OverflowError as err:
+                # Most likely a TA time before the parent TC's
+                # time_start, which cannot be stored as a uint32 offset.
+                raise ValueError(
+                        f"TA field out of range for ta_dt on TC index {len(tc_list) - 1} "
+                        f"(time anchor {anchor}) in fragment\n{fragment_path}"
+                ) from err
+            ta_list.append(np_ta_data)  # Jagged array
+
+        return np.array(tc_list, dtype=self.tc_dt), ta_list
+
+    def read_all_fragments(self) -> None:
+        """
+        Read all TC fragments using a thread pool.
+
+        Fragment reads are independent, so the HDF5 reads of different
+        paths overlap across threads; each worker uses its own HDF5
+        handle, fills local arrays, and the results are concatenated
+        once at the end.
+        """
+        self._filter_fragment_paths()
 
         if self._verbosity >= 2:
-            print("INFO: Finished reading.")
-            print("="*60)
-        return np_tc_datum
+            # The per-TC debug prints would interleave across workers,
+            # so read serially when full output is requested.
+            results = [self.read_fragment(path) for path in self._fragment_paths]
+        else:
+            with ThreadPoolExecutor(max_workers=self._MAX_READ_WORKERS) as executor:
+                results = list(executor.map(self.read_fragment, self._fragment_paths))
+
+        for name in self.tc_data:
+            self.tc_data[name] = np.concatenate(
+                    [self.tc_data[name]] + [np_tc_data[name] for np_tc_data, _ in results])
+        for _, ta_list in results:
+            self.ta_data.extend(ta_list)
+
+        # Flatten the jagged TA list into one contiguous array; the TAs
+        # of the i-th TC live at ta_offsets[i]:ta_offsets[i + 1].
+        if self.ta_data:
+            self.ta_data_flat = np.concatenate(self.ta_data)
+        self.ta_offsets = np.cumsum([0] + [len(ta) for ta in self.ta_data], dtype=np.int64)
+
+        # Print how many fragments were empty as a debug.
+        if self._verbosity >= 1 and self._num_empty != 0:
+            print(
+                    self._FAIL_TEXT_COLOR
+                    + self._BOLD_TEXT
+                    + f"WARNING: Skipped {self._num_empty} frags."
+                    + self._END_TEXT_COLOR
+            )
+
+        return None
+
+    def get_tas(self, tc_index: int) -> NDArray:
+        """
+        Return the TAs of the TC at :tc_index: as a view into
+        :self.ta_data_flat:.
+        """
+        return self.ta_data_flat[self.ta_offsets[tc_index]:self.ta_offsets[tc_index + 1]]
 
     def clear_data(self) -> None:
-        self.tc_data = np.array([], dtype=self.tc_dt)
+        self.tc_data = {name: np.empty(0, dtype=dt) for name, (dt, _) in self.tc_dt.fields.items()}
         self.ta_data = []
+        self.ta_data_flat = np.empty(0, dtype=self.ta_dt)
+        self.ta_offsets = np.zeros(1, dtype=np.int64)
@@ -20,11 +20,75 @@ from matplotlib.backends.backend_pdf import PdfPages
 import os
 import re
 import argparse
+from collections import defaultdict
 import spill_mode_matching as spill
 
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; fall back to the pure NumPy path.
+    njit = None
+
 # Constants
 TICK_TO_SEC_SCALE = 16e-9  # s per tick
 
+# Compiled once; extract_run_subrun runs inside nested loops over file paths.
+_RUN_SUBRUN_RE = re.compile(r"run(\d{6})_(\d{4})")
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _bucket_apas(channel: np.ndarray, time_start: np.ndarray, adc_integral: np.ndarray,
+                     limits: np.ndarray) -> tuple:
+        """
+        Single-pass bucketing of TPs into APA channel ranges.
+
+        Assigns each TP to one of the APA ranges in :limits: (or none),
+        computes the per-APA minimum start time, and scatters the
+        (channel, relative time, ADC integral) triples into flat output
+        arrays. :offsets[i]:offsets[i+1]: slices out APA i.
+        """
+        n = channel.shape[0]
+        n_apas = limits.shape[0]
+
+        # Assign each TP to an APA bin (-1: outside every range).
+        bins = np.full(n, -1, dtype=np.int8)
+        for i in prange(n):
+            for j in range(n_apas):
+                if channel[i] >= limits[j, 0] and channel[i] <= limits[j, 1]:
+                    bins[i] = j
+                    break
+
+        # Per-APA counts and minimum start times.
+        counts = np.zeros(n_apas, dtype=np.int64)
+        mins = np.zeros(n_apas, dtype=time_start.dtype)
+        seen = np.zeros(n_apas, dtype=np.bool_)
+        for i in range(n):
+            b = bins[i]
+            if b >= 0:
+                counts[b] += 1
+                if not seen[b] or time_start[i] < mins[b]:
+                    mins[b] = time_start[i]
+                    seen[b] = True
+
+        offsets = np.zeros(n_apas + 1, dtype=np.int64)
+        for j in range(n_apas):
+            offsets[j + 1] = offsets[j] + counts[j]
+
+        # Scatter into the flat per-APA outputs.
+        out_channel = np.empty(offsets[n_apas], dtype=channel.dtype)
+        out_times = np.empty(offsets[n_apas], dtype=time_start.dtype)
+        out_adc = np.empty(offsets[n_apas], dtype=adc_integral.dtype)
+        cursors = offsets[:-1].copy()
+        for i in range(n):
+            b = bins[i]
+            if b >= 0:
+                k = cursors[b]
+                out_channel[k] = channel[i]
+                out_times[k] = time_start[i] - mins[b]
+                out_adc[k] = adc_integral[i]
+                cursors[b] = k + 1
+
+        return out_channel, out_times, out_adc, offsets
+
 def find_save_name(run_id: int, subrun_id: int, trg_record_id: int, overwrite: bool) -> str:
     """
     Find a new save name or overwrite an existing one.
@@ -69,32 +133,63 @@ def plot_pdf_start_time_vs_channel_per_apa(tp_data: np.ndarray, pdf: PdfPages) -
         (4160, 4640),  # APA 3
         (9280, 9760)   # APA 4
     ]
-    
-    for start, end in apa_limits:
-        # Filter data for the current APA
-        mask = (tp_data['channel'] >= start) & (tp_data['channel'] <= end)
-        filtered_data = tp_data[mask]
 
-        # Check if filtered_data is empty
-        if filtered_data.size == 0:
+    # One-time contiguous column extraction (struct-of-arrays copy).
+    channel_col = np.ascontiguousarray(tp_data['channel'])
+    time_col = np.ascontiguousarray(tp_data['time_start'])
+    adc_col = np.ascontiguousarray(tp_data['adc_integral'])
+
+    # Bucket the TPs per APA as (channel, relative time, ADC integral).
+    apa_points = []
+    if njit is not None:
+        # Fused single pass over the TPs.
+        out_channel, out_times, out_adc, offsets = _bucket_apas(
+                channel_col, time_col, adc_col,
+                np.asarray(apa_limits, dtype=np.int64))
+        for apa_idx in range(len(apa_limits)):
+            sel = slice(offsets[apa_idx], offsets[apa_idx + 1])
+            apa_points.append((out_channel[sel], out_times[sel], out_adc[sel]))
+    else:
+        # Sort by channel once; each APA is then a contiguous slice of
+        # the sort order instead of a fresh full-array boolean scan.
+        order = np.argsort(channel_col)
+        sorted_channel = channel_col[order]
+        for start, end in apa_limits:
+            lo = np.searchsorted(sorted_channel, start, side='left')
+            hi = np.searchsorted(sorted_channel, end, side='right')
+            sel = order[lo:hi]
+            times = time_col[sel]
+            if times.size != 0:
+                # The gather above already made a private copy, so
+                # subtract the minimum in place instead of allocating
+                # a second relative-time array.
+                np.subtract(times, times.min(), out=times)
+            apa_points.append((channel_col[sel], times, adc_col[sel]))
+
+    # One figure with a 2x2 grid of Axes; figure construction and the
+    # PDF page overhead are paid once instead of once per APA.
+    fig, axes = plt.subplots(2, 2, figsize=(12, 8), dpi=200)
+    for apa_idx, (ax, (start, end), (channel, times, adc)) in enumerate(zip(axes.flat, apa_limits, apa_points)):
+        # Check if the APA bucket is empty
+        if channel.size == 0:
             print(f"No data for APA range {start}-{end}. Skipping plot.")
+            ax.set_axis_off()
             continue
 
-        plt.figure(figsize=(6, 4), dpi=200)
-        times = filtered_data['time_start'] - np.min(filtered_data['time_start'])
-        channel = filtered_data['channel']
-        plt.scatter(channel, times, c=filtered_data['adc_integral'], s=2, norm=matplotlib.colors.LogNorm())
-        plt.colorbar(ax=plt.gca(), cmap='viridis', label='ADC integral', format='%d')  # format='%.0e' for scientific notation
+        # Rasterize so the PDF stores one bitmap per page instead of a
+        # vector glyph per TP; write time and file size stay O(dpi).
+        sc = ax.scatter(channel, times, c=adc, s=2, norm=matplotlib.colors.LogNorm(), rasterized=True)
+        fig.colorbar(sc, ax=ax, label='ADC integral', format='%d')  # format='%.0e' for scientific notation
 
-        plt.title(f"TP Start Time vs Channel for APA {apa_limits.index((start, end)) + 1}")
-        plt.xlabel("Channel")
-        plt.ylabel("Relative Start Time (ticks)")
-        plt.xlim(start, end)
-        # plt.ylim(0, 80000)  # Uncomment if a fixed y-axis range is desired
+        ax.set_title(f"TP Start Time vs Channel for APA {apa_idx + 1}")
+        ax.set_xlabel("Channel")
+        ax.set_ylabel("Relative Start Time (ticks)")
+        ax.set_xlim(start, end)
+        # ax.set_ylim(0, 80000)  # Uncomment if a fixed y-axis range is desired
 
-        plt.tight_layout()
-        pdf.savefig()
-        plt.close()
+    fig.tight_layout()
+    pdf.savefig(fig, dpi=200)
+    plt.close(fig)
 
 
 def read_file_paths(filelist_path: str) -> list:
@@ -121,35 +216,29 @@ def extract_run_subrun(file_path):
     Returns:
         (str, str): Run number, Subrun number
     """
-    match = re.search(r"run(\d{6})_(\d{4})", file_path)
+    match = _RUN_SUBRUN_RE.search(file_path)
     if match:
         return match.group(1), match.group(2)  # Run number, Subrun number
     return None, None
 
-def select_file_paths(filelist, desired_run, desired_subrun):
+def index_file_paths(filelist):
     """
-    Selects file paths from a file list based on the desired run and subrun numbers.
-    
+    Indexes file paths by their (run, subrun) numbers.
+
     Parameters:
         filelist (list): list containing the file paths.
-        desired_run (str): Desired run number.
-        desired_subrun (str): Desired subrun number.
-    
+
     Returns:
-        (list): List of file paths.
+        (dict): Mapping of (run, subrun) to the list of matching file paths.
     """
-    filtered_paths = []
+    paths_by_run_subrun = defaultdict(list)
     for file_path in filelist:
-        try:
-            run, subrun = extract_run_subrun(file_path)
-            # Ensure run and subrun are strings for comparison
-            run, subrun = int(run), int(subrun)
-            if run == desired_run and subrun == desired_subrun:
-                filtered_paths.append(file_path)
-        except Exception as e:
-            # Handle or log the error as appropriate
-            print(f"Error extracting run and subrun from {file_path}: {e}")
-    return filtered_paths
+        run, subrun = extract_run_subrun(file_path)
+        if run is None:
+            print(f"Error extracting run and subrun from {file_path}")
+            continue
+        paths_by_run_subrun[(int(run), int(subrun))].append(file_path)
+    return paths_by_run_subrun
 
 def parse():
     """
@@ -222,22 +311,25 @@ def main():
     df_trg_records = spill.spill_mode_matching(spill_file, trg_records_file)
     df_spillON = df_trg_records[df_trg_records['spill_mode'] == 'ON']
     runs = df_spillON['Run'].unique()
+    # Index the file paths by (run, subrun) once instead of rescanning
+    # the full list for every pair.
+    paths_by_run_subrun = index_file_paths(file_paths)
 
     for run in runs:
         subruns = df_spillON[df_spillON['Run'] == run]['Subrun'].unique()
         for subrun in subruns:
             print(f"Processing Run {run}, Subrun {subrun}")
             trg_records = df_spillON[(df_spillON['Run'] == run) & (df_spillON['Subrun'] == subrun)]['Trigger_Record'].unique()
+            # Partition the trigger records by parity once per subrun; the split does not depend on the file path
+            even_trg_records = [trgID for trgID in trg_records if trgID % 2 == 0]  # Even trigger records: dataflow0
+            odd_trg_records = [trgID for trgID in trg_records if trgID % 2 != 0]  # Odd trigger records: dataflow1
             # Filter and read the data from the filtered file list. This will contain files with different dataflow numbering
-            for file_path in select_file_paths(file_paths, run, subrun):
+            for file_path in paths_by_run_subrun.get((run, subrun), []):
                 print(f"File: {file_path}")
 
                 # Determine if we are dealing with even or odd trigger records based on the file path. This must be modified in case of further dataflows
-                if "dataflow0" in file_path:
-                    filtered_trg_records = [trgID for trgID in trg_records if trgID % 2 == 0]  # Even trigger records: dataflow0
-                else:
-                    filtered_trg_records = [trgID for trgID in trg_records if trgID % 2 != 0]  # Odd trigger records: dataflow1
-                
+                filtered_trg_records = even_trg_records if "dataflow0" in file_path else odd_trg_records
+
                 for trg_record in filtered_trg_records:
                     print(f"Processing Trigger Record {trg_record}")
                     data = trgtools.TPReader(file_path, trg_record, verbosity)
@@ -34,33 +34,63 @@ def parse():
 
     return parser.parse_args()
 
-def spill_mode_matching(spill_file: str, trg_records_file: str) -> pd:
-    # Process Arguments & Data
-    # args = parse()
-    # spill_file = args.spill_filename
-    # trg_records_file = args.trg_records_filename
-
-    # Read the data from the files
-    spill_df = pd.read_csv(spill_file)
-    trig_Records = pd.read_csv(trg_records_file)
+def spill_mode_matching(spill_file: str, trg_records_file: str) -> pd.DataFrame:
+    # Read the data from the files. Plain NumPy columns keep the
+    # matching free of pandas block-manager and per-row object overhead.
+    # atleast_1d: genfromtxt returns a 0-d array for a single-row CSV.
+    spill_rec = np.atleast_1d(
+            np.genfromtxt(spill_file, delimiter=',', names=True, dtype=None, encoding=None))
+    trig_rec = np.atleast_1d(
+            np.genfromtxt(trg_records_file, delimiter=',', names=True, dtype=None, encoding=None))
 
     # Extract the start time from the specified column
-    time_spill = (spill_df['Clock'])/1000
-    
+    time_spill = spill_rec['Clock']/1000
+
     # Convert the timestamp from DTS to seconds
-    trig_Records['Timestamp'] = trig_Records['Timestamp']*TICK_TO_SEC_SCALE
-    
+    timestamps = trig_rec['Timestamp']*TICK_TO_SEC_SCALE
+
     # Assign the spill mode to the TPs
-    trig_Records['spill_mode'] = 'OFF' # OFF is the default mode
-    for time_ON in time_spill:
-        assign_tps_spill_ON(time_ON, trig_Records)
+    spill_ON = match_spills_ON(timestamps, time_spill)
     print("Trigger Records were assigned to spill mode.")
 
+    # Materialize a DataFrame only at the end for downstream consumers.
+    trig_Records = pd.DataFrame({name: trig_rec[name] for name in trig_rec.dtype.names})
+    trig_Records['Timestamp'] = timestamps
+    # Categorical column: one int8 code per row instead of a Python
+    # string object per row; comparisons against 'ON'/'OFF' still work.
+    trig_Records['spill_mode'] = pd.Categorical.from_codes(
+            spill_ON.astype(np.int8), categories=['OFF', 'ON'])
+
     return trig_Records
 
-# Function to assign TPs the spill ON tag
-def assign_tps_spill_ON(time_ON: float, df_trig_record: pd) -> None:
-    df_trig_record.loc[(df_trig_record['Timestamp'] >= time_ON) & (df_trig_record['Timestamp'] <= time_ON + spill_duration), 'spill_mode'] = 'ON'
+# Function to tag the timestamps falling inside a spill ON window
+def match_spills_ON(timestamps: np.ndarray, spill_starts: np.ndarray) -> np.ndarray:
+    """
+    Returns a boolean mask marking the timestamps inside any
+    [start, start + spill_duration] window, inclusive on both ends.
+
+    One sorted pass with np.searchsorted replaces a full scan of the
+    timestamps per spill window.
+    """
+    order = np.argsort(timestamps)
+    ts_sorted = timestamps[order]
+
+    starts = np.sort(spill_starts)
+    ends = starts + spill_duration
+    left = np.searchsorted(ts_sorted, starts, side='left')
+    right = np.searchsorted(ts_sorted, ends, side='right')
+
+    # Interval marks: +1 where a window opens, -1 past where it closes;
+    # the running sum is positive inside at least one window.
+    marks = np.zeros(len(ts_sorted) + 1, dtype=np.int32)
+    np.add.at(marks, left, 1)
+    np.add.at(marks, right, -1)
+    on_sorted = np.cumsum(marks[:-1]) > 0
+
+    # Undo the sort to match the original timestamp order.
+    spill_ON = np.empty_like(on_sorted)
+    spill_ON[order] = on_sorted
+    return spill_ON
 
 # Main function to plot the TP distribution
 if __name__ == "__main__":